@@ -1,17 +1,53 @@
+from django.core.cache import cache
 from rest_framework import serializers
 from .models import Category, Product, Order, OrderItem
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CachedRepresentationMixin:
+    """Reuse the rendered representation of rows that have not changed.
+
+    Entries are keyed on the serializer class and the row's updated_at, so any
+    save() produces a new key and stale entries simply age out of the cache.
+    QuerySet.update() does not bump auto_now fields, so rows changed that way
+    keep serving their old representation until updated_at is set explicitly.
+    """
+
+    def get_representation_version(self, instance):
+        return instance.updated_at.timestamp()
+
+    def to_representation(self, instance):
+        serializer_class = type(self)
+        key = 'repr:{}.{}:{}:{}:{}'.format(
+            serializer_class.__module__,
+            serializer_class.__qualname__,
+            instance._meta.label_lower,
+            instance.pk,
+            self.get_representation_version(instance),
+        )
+        data = cache.get(key)
+        if data is None:
+            data = super().to_representation(instance)
+            cache.set(key, data)
+        return data
+
+
+class CategorySerializer(CachedRepresentationMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ['id', 'name', 'description', 'created_at', 'updated_at']
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(CachedRepresentationMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     is_available = serializers.ReadOnlyField()
 
+    def get_representation_version(self, instance):
+        # category_name comes from the related row, so its version counts too
+        return '{}-{}'.format(
+            instance.updated_at.timestamp(),
+            instance.category.updated_at.timestamp(),
+        )
+
     class Meta:
         model = Product
         fields = ['id', 'name', 'description', 'price', 'category', 'category_name', 
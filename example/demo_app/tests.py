@@ -8,8 +8,9 @@ from .models import Category, Product, Order, OrderItem
 
 
 class CategoryModelTest(TestCase):
-    def setUp(self):
-        self.category = Category.objects.create(
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(
             name="Electronics",
             description="Electronic devices and gadgets"
         )
@@ -31,16 +32,17 @@ class CategoryModelTest(TestCase):
 
 
 class ProductModelTest(TestCase):
-    def setUp(self):
-        self.category = Category.objects.create(
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(
             name="Electronics",
             description="Electronic devices"
         )
-        self.product = Product.objects.create(
+        cls.product = Product.objects.create(
             name="Laptop",
             description="High-performance laptop",
             price=Decimal('999.99'),
-            category=self.category,
+            category=cls.category,
             stock_quantity=10
         )
 
@@ -71,14 +73,15 @@ class ProductModelTest(TestCase):
 
 
 class OrderModelTest(TestCase):
-    def setUp(self):
-        self.user = User.objects.create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
             username='testuser',
             email='test@example.com',
             password='testpass123'
         )
-        self.order = Order.objects.create(
-            user=self.user,
+        cls.order = Order.objects.create(
+            user=cls.user,
             total_amount=Decimal('199.98')
         )
 
@@ -104,26 +107,27 @@ class OrderModelTest(TestCase):
 
 
 class OrderItemModelTest(TestCase):
-    def setUp(self):
-        self.user = User.objects.create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
             username='testuser',
             email='test@example.com',
             password='testpass123'
         )
-        self.category = Category.objects.create(name="Electronics")
-        self.product = Product.objects.create(
+        cls.category = Category.objects.create(name="Electronics")
+        cls.product = Product.objects.create(
             name="Laptop",
             description="High-performance laptop",
             price=Decimal('999.99'),
-            category=self.category
+            category=cls.category
         )
-        self.order = Order.objects.create(
-            user=self.user,
+        cls.order = Order.objects.create(
+            user=cls.user,
             total_amount=Decimal('1999.98')
         )
-        self.order_item = OrderItem.objects.create(
-            order=self.order,
-            product=self.product,
+        cls.order_item = OrderItem.objects.create(
+            order=cls.order,
+            product=cls.product,
             quantity=2,
             price=Decimal('999.99')
         )
@@ -147,55 +151,89 @@ class OrderItemModelTest(TestCase):
 
 
 class CategoryAPITest(APITestCase):
-    def setUp(self):
-        self.category = Category.objects.create(
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(
             name="Electronics",
             description="Electronic devices"
         )
+        cls.list_url = reverse('category-list')
+        cls.detail_url = reverse('category-detail', kwargs={'pk': cls.category.pk})
+        cls.products_url = reverse('category-products', kwargs={'pk': cls.category.pk})
 
     def test_list_categories(self):
         """Test listing all categories"""
-        url = reverse('category-list')
-        response = self.client.get(url)
+        response = self.client.get(self.list_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         # Check paginated response structure
         self.assertIn('results', response.data)
         self.assertEqual(len(response.data['results']), 1)
         self.assertEqual(response.data['results'][0]['name'], "Electronics")
 
+    def test_list_categories_not_modified(self):
+        """Test that an unchanged category list returns 304 for its ETag"""
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Category.objects.create(name="Books")
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
     def test_create_category(self):
         """Test creating a new category"""
-        url = reverse('category-list')
         data = {
             'name': 'Books',
             'description': 'Books and literature'
         }
-        response = self.client.post(url, data)
+        response = self.client.post(self.list_url, data)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Category.objects.count(), 2)
 
     def test_retrieve_category(self):
         """Test retrieving a specific category"""
-        url = reverse('category-detail', kwargs={'pk': self.category.pk})
-        response = self.client.get(url)
+        response = self.client.get(self.detail_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['name'], "Electronics")
 
+    def test_retrieve_category_not_modified(self):
+        """Test that an unchanged category returns 304 for its ETag"""
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', response)
+        etag = response['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.category.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_category_invalid_pk(self):
+        """Test that a non-numeric category id returns 404"""
+        url = reverse('category-detail', kwargs={'pk': 'abc'})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_update_category(self):
         """Test updating a category"""
-        url = reverse('category-detail', kwargs={'pk': self.category.pk})
         data = {'name': 'Updated Electronics', 'description': 'Updated description'}
-        response = self.client.put(url, data)
+        response = self.client.put(self.detail_url, data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.category.refresh_from_db()
+        self.category.refresh_from_db(fields=['name'])
         self.assertEqual(self.category.name, 'Updated Electronics')
 
     def test_delete_category(self):
         """Test deleting a category"""
-        url = reverse('category-detail', kwargs={'pk': self.category.pk})
-        response = self.client.delete(url)
+        response = self.client.delete(self.detail_url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
-        self.assertEqual(Category.objects.count(), 0)
+        self.assertFalse(Category.objects.exists())
 
     def test_category_products_endpoint(self):
         """Test the custom products endpoint for a category"""
@@ -207,39 +245,96 @@ class CategoryAPITest(APITestCase):
             category=self.category
         )
         
-        url = reverse('category-products', kwargs={'pk': self.category.pk})
-        response = self.client.get(url)
+        response = self.client.get(self.products_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
         self.assertEqual(response.data[0]['name'], "Laptop")
 
+    def test_category_products_query_count(self):
+        """Test that the products endpoint does not query per product"""
+        for i in range(3):
+            Product.objects.create(
+                name=f"Product {i}",
+                description="Product description",
+                price=Decimal('9.99'),
+                category=self.category
+            )
+
+        # One query for the category, one for its products
+        with self.assertNumQueries(2):
+            response = self.client.get(self.products_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 3)
+
 
 class ProductAPITest(APITestCase):
-    def setUp(self):
-        self.category = Category.objects.create(
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(
             name="Electronics",
             description="Electronic devices"
         )
-        self.product = Product.objects.create(
+        cls.product = Product.objects.create(
             name="Laptop",
             description="High-performance laptop",
             price=Decimal('999.99'),
-            category=self.category,
+            category=cls.category,
             stock_quantity=5
         )
+        cls.list_url = reverse('product-list')
+        cls.detail_url = reverse('product-detail', kwargs={'pk': cls.product.pk})
+        cls.in_stock_url = reverse('product-in-stock')
+        cls.by_category_url = reverse('product-by-category')
 
     def test_list_products(self):
         """Test listing all products"""
-        url = reverse('product-list')
-        response = self.client.get(url)
+        response = self.client.get(self.list_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         # Check paginated response structure
         self.assertIn('results', response.data)
         self.assertEqual(len(response.data['results']), 1)
 
+    def test_list_products_query_count(self):
+        """Test that listing products does not query per product category"""
+        for i in range(3):
+            category = Category.objects.create(name=f"Category {i}")
+            Product.objects.create(
+                name=f"Product {i}",
+                description="Product description",
+                price=Decimal('9.99'),
+                category=category
+            )
+
+        # Collection ETag, page count, then one page of products joined to
+        # their categories
+        with self.assertNumQueries(3):
+            response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 4)
+
+    def test_product_reflects_category_rename(self):
+        """Test that a cached product representation follows its category"""
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.data['category_name'], "Electronics")
+
+        self.category.name = "Gadgets"
+        self.category.save()
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.data['category_name'], "Gadgets")
+
+    def test_list_products_after_category_rename(self):
+        """Test that renaming a category invalidates the product list ETag"""
+        response = self.client.get(self.list_url)
+        etag = response['ETag']
+
+        self.category.name = "Gadgets"
+        self.category.save()
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['category_name'], "Gadgets")
+
     def test_create_product(self):
         """Test creating a new product"""
-        url = reverse('product-list')
         data = {
             'name': 'Smartphone',
             'description': 'Latest smartphone',
@@ -247,7 +342,7 @@ class ProductAPITest(APITestCase):
             'category': self.category.id,
             'stock_quantity': 10
         }
-        response = self.client.post(url, data)
+        response = self.client.post(self.list_url, data)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Product.objects.count(), 2)
 
@@ -262,8 +357,7 @@ class ProductAPITest(APITestCase):
             in_stock=False
         )
         
-        url = reverse('product-in-stock')
-        response = self.client.get(url)
+        response = self.client.get(self.in_stock_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)  # Only the in-stock product
         self.assertEqual(response.data[0]['name'], "Laptop")
@@ -279,29 +373,33 @@ class ProductAPITest(APITestCase):
             category=other_category
         )
         
-        url = reverse('product-by-category')
-        response = self.client.get(url, {'category_id': self.category.id})
+        response = self.client.get(self.by_category_url, {'category_id': self.category.id})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['name'], "Laptop")
+        # Check paginated response structure
+        self.assertIn('results', response.data)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['name'], "Laptop")
 
 
 class OrderAPITest(APITestCase):
-    def setUp(self):
-        self.user = User.objects.create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
             username='testuser',
             email='test@example.com',
             password='testpass123'
         )
-        self.order = Order.objects.create(
-            user=self.user,
+        cls.order = Order.objects.create(
+            user=cls.user,
             total_amount=Decimal('199.98')
         )
+        cls.list_url = reverse('order-list')
+        cls.cancel_url = reverse('order-cancel', kwargs={'pk': cls.order.pk})
+        cls.ship_url = reverse('order-ship', kwargs={'pk': cls.order.pk})
 
     def test_list_orders(self):
         """Test listing all orders"""
-        url = reverse('order-list')
-        response = self.client.get(url)
+        response = self.client.get(self.list_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         # Check paginated response structure
         self.assertIn('results', response.data)
@@ -309,10 +407,9 @@ class OrderAPITest(APITestCase):
 
     def test_cancel_order_endpoint(self):
         """Test the cancel order endpoint"""
-        url = reverse('order-cancel', kwargs={'pk': self.order.pk})
-        response = self.client.post(url)
+        response = self.client.post(self.cancel_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.order.refresh_from_db()
+        self.order.refresh_from_db(fields=['status'])
         self.assertEqual(self.order.status, 'cancelled')
 
     def test_ship_order_endpoint(self):
@@ -321,15 +418,13 @@ class OrderAPITest(APITestCase):
         self.order.status = 'processing'
         self.order.save()
         
-        url = reverse('order-ship', kwargs={'pk': self.order.pk})
-        response = self.client.post(url)
+        response = self.client.post(self.ship_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.order.refresh_from_db()
+        self.order.refresh_from_db(fields=['status'])
         self.assertEqual(self.order.status, 'shipped')
 
     def test_ship_pending_order_fails(self):
         """Test that shipping a pending order fails"""
-        url = reverse('order-ship', kwargs={'pk': self.order.pk})
-        response = self.client.post(url)
+        response = self.client.post(self.ship_url)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn('error', response.data)
@@ -1,3 +1,8 @@
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -5,35 +10,120 @@ from .models import Category, Product, Order
 from .serializers import CategorySerializer, ProductSerializer, OrderSerializer
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CollectionETagMixin:
+    """Answer unchanged list requests with 304 Not Modified.
+
+    The collection version is the row count plus the latest value of each
+    collection_version_fields entry, so only a single aggregate query runs
+    when the client's copy is current. List any related timestamps the
+    serializer renders from, or edits to those rows will keep answering 304.
+    """
+    collection_version_fields = ('updated_at',)
+
+    def list(self, request, *args, **kwargs):
+        etag = self.get_collection_etag()
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            return response
+
+        response = super().list(request, *args, **kwargs)
+        response['ETag'] = etag
+        return response
+
+    def get_collection_etag(self):
+        aggregates = {field: Max(field) for field in self.collection_version_fields}
+        version = self.filter_queryset(self.get_queryset()).aggregate(
+            count=Count('pk'), **aggregates
+        )
+        parts = [version['count']]
+        for field in self.collection_version_fields:
+            last_modified = version[field]
+            parts.append(last_modified.timestamp() if last_modified else 0)
+        return 'W/"{}"'.format('-'.join(str(part) for part in parts))
+
+
+class ResourceETagMixin:
+    """Answer unchanged retrieve requests with 304 Not Modified.
+
+    The version is read with a narrow values_list query, so a matching
+    request never loads or serializes the full row. That also means a 304 is
+    returned without check_object_permissions, so only use this mixin on
+    viewsets that have no object-level permissions.
+    """
+
+    version_fields = ('updated_at',)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            version = (
+                self.filter_queryset(self.get_queryset())
+                .filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+                .values_list(*self.version_fields)
+                .first()
+            )
+        except (TypeError, ValueError, ValidationError):
+            # A malformed lookup value is a missing row, as in get_object_or_404
+            raise Http404
+        if version is None:
+            # Let the standard retrieve produce the 404
+            return super().retrieve(request, *args, **kwargs)
+
+        timestamps = [value.timestamp() for value in version]
+        etag = 'W/"{}"'.format('-'.join(str(timestamp) for timestamp in timestamps))
+        last_modified = int(max(timestamps))
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is not None:
+            return response
+
+        response = super().retrieve(request, *args, **kwargs)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+class CategoryViewSet(CollectionETagMixin, ResourceETagMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
 
     @action(detail=True, methods=['get'])
     def products(self, request, pk=None):
         category = self.get_object()
+        # The reverse manager attaches this category to every product it
+        # returns, so rendering category_name needs no per-product queries
         products = category.products.all()
         serializer = ProductSerializer(products, many=True)
         return Response(serializer.data)
 
 
-class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.all()
+class ProductViewSet(CollectionETagMixin, ResourceETagMixin, viewsets.ModelViewSet):
+    # ProductSerializer renders category.name, so join the category up front.
+    # Order by pk so paginated pages (including by_category) are stable.
+    queryset = Product.objects.select_related('category').order_by('pk')
     serializer_class = ProductSerializer
+    version_fields = ('updated_at', 'category__updated_at')
+    collection_version_fields = version_fields
 
     @action(detail=False, methods=['get'])
     def in_stock(self, request):
-        products = self.queryset.filter(in_stock=True)
+        products = self.get_queryset().filter(in_stock=True)
         serializer = self.get_serializer(products, many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def by_category(self, request):
         category_id = request.query_params.get('category_id')
+        products = self.filter_queryset(self.get_queryset())
         if category_id:
-            products = self.queryset.filter(category_id=category_id)
-        else:
-            products = self.queryset.all()
+            products = products.filter(category_id=category_id)
+
+        page = self.paginate_queryset(products)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
         serializer = self.get_serializer(products, many=True)
         return Response(serializer.data)
 
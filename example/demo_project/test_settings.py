@@ -0,0 +1,12 @@
+"""
+Django settings for running the demo_project test suite.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+# Build the test schema straight from the models instead of replaying
+# migrations; combine with --keepdb to reuse the schema between runs, and
+# drop --keepdb once after model changes, since a kept schema is not updated
+MIGRATION_MODULES = {
+    'demo_app': None,
+}
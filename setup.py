@@ -37,6 +37,9 @@ setup(
         "pytest>=6.0",
     ],
     extras_require={
+        "fast": [
+            "orjson>=3.4",
+        ],
         "dev": [
             "pytest>=6.0",
             "black",
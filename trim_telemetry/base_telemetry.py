@@ -2,93 +2,304 @@
 Base telemetry collection logic shared across test runners
 """
 
+import atexit
 import json
 import time
 import threading
 import os
+import queue
+import sys
+from collections import deque
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+if orjson is not None:
+
+    def _dumps_line(data: Dict[str, Any]) -> bytes:
+        """Serialize telemetry data to one newline-terminated NDJSON line."""
+        # orjson appends the newline itself, avoiding a copy of the payload
+        return orjson.dumps(data, option=orjson.OPT_APPEND_NEWLINE)
+
+else:
+    # Compact separators and raw UTF-8 match orjson's output and keep lines small
+    _encode = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode
+
+    def _dumps_line(data: Dict[str, Any]) -> bytes:
+        """Serialize telemetry data to one newline-terminated NDJSON line."""
+        return (_encode(data) + "\n").encode("utf-8")
+
+
+# Version of the flattened record schema documented in SCHEMA.md
+SCHEMA_VERSION = "1.0.0"
+
+# Shared results for tests with no database or network activity; treat as
+# read-only
+_EMPTY_DATABASE_TELEMETRY = {"queries": ()}
+_EMPTY_NETWORK_TELEMETRY = {"urls": ()}
+
+# Queued after the last record to tell the background writer to exit
+_STOP_WRITER = object()
+
 
 class BaseTelemetryCollector:
     """Base class for telemetry collection across different test frameworks."""
 
+    # Set to False to skip installing network call interception entirely.
+    # None defers to TRIM_TELEMETRY_NETWORK (0 disables), read when each
+    # collector is created so it can be set after import
+    record_network_calls = None
+
+    # Maximum number of network calls kept per test; older calls are evicted
+    max_network_calls = 1024
+
+    # Set to False to drop skipped tests instead of writing a record for each
+    record_skipped = True
+
+    # "immediate" flushes every record as it is produced; "batch" leaves
+    # records in the file buffer until batch_flush_bytes fill it or the run ends;
+    # "background" hands records to a writer thread that serializes and writes
+    # them in batches off the test thread
+    flush_mode = "immediate"
+    batch_flush_bytes = 64 * 1024
+
+    # Records the background writer may hold before new ones are dropped
+    writer_queue_size = 10000
+    # Largest number of records the background writer joins into one write
+    writer_batch_size = 256
+
     def __init__(self, run_id: str):
         self.run_id = run_id
-        self.test_status = {}
+        if self.record_network_calls is None:
+            self.record_network_calls = (
+                os.environ.get("TRIM_TELEMETRY_NETWORK", "1") != "0"
+            )
+        # Per-test state, keyed by test id. Each test only touches its own
+        # keys, and every access is a single assignment, get, setdefault or
+        # pop(test_id, None), each atomic under the GIL, so these dicts need
+        # no lock. Never split an access into a check followed by an act.
+        # Subclasses may keep state for the running test outside these dicts
+        # (see DjangoTelemetryCollector), which assumes one test at a time.
         self.test_timings = {}
         self.test_queries = {}  # Store queries for each test
         self.test_network_calls = {}  # Store network calls for each test
+        # (class name, module, file) per test class, computed on first use
+        self._class_meta_cache = {}
         self._thread_local = threading.local()
+        # Guards per-test network call buffers, which may be appended to from
+        # threads started by the test while end_test is reading them
+        self._network_lock = threading.Lock()
 
         # Set up telemetry file
         self.telemetry_dir = os.path.join(os.getcwd(), ".telemetry")
         self.telemetry_file = os.path.join(self.telemetry_dir, f"{run_id}.ndjson")
+        # Serializes writes to the shared file handle across threads
+        self._write_lock = threading.Lock()
+        self._fh = None
         self._ensure_telemetry_file()
 
+        # Background writer state, created on first use in "background" mode
+        self._queue = None
+        self._writer_thread = None
+        self.dropped_records = 0
+        atexit.register(self.close_telemetry)
+
     def _ensure_telemetry_file(self):
-        """Ensure the telemetry directory and file exist and are writable."""
+        """Ensure the telemetry directory exists and open the file for appending."""
         try:
             # Create the .telemetry directory if it doesn't exist
             if not os.path.exists(self.telemetry_dir):
                 os.makedirs(self.telemetry_dir, exist_ok=True)
 
-            # Create the file if it doesn't exist
-            if not os.path.exists(self.telemetry_file):
-                with open(self.telemetry_file, "w") as f:
-                    pass  # Create empty file
+            # Open once for the whole run rather than once per record
+            self._fh = open(
+                self.telemetry_file, "ab", buffering=self.batch_flush_bytes
+            )
         except Exception:
-            # If we can't create the file, fall back to stdout
+            # If we can't open the file, fall back to stdout
             self.telemetry_file = None
+            self._fh = None
 
     def _write_telemetry(self, data: Dict[str, Any]):
         """Write telemetry data to file or stdout."""
+        if self.flush_mode == "background":
+            self._enqueue_telemetry(data)
+            return
+
+        # Serialize once; orjson is used when available and emits bytes directly
+        self._write_payload(_dumps_line(data), self.flush_mode != "batch")
+
+    def _write_payload(self, payload: bytes, flush: bool):
+        """Write serialized telemetry lines to file or stdout."""
+        with self._write_lock:
+            if self._fh is not None:
+                try:
+                    self._fh.write(payload)
+                    if flush:
+                        self._fh.flush()
+                    return
+                except Exception:
+                    # If file writing fails, fall back to stdout
+                    pass
+            self._write_stdout(payload, flush)
+
+    def _enqueue_telemetry(self, data: Dict[str, Any]):
+        """Hand a record to the background writer without blocking the test."""
+        if self._writer_thread is None:
+            with self._write_lock:
+                # Re-check under the lock so racing callers start one writer
+                if self._writer_thread is None:
+                    self._start_writer()
         try:
-            if self.telemetry_file:
-                with open(self.telemetry_file, "a") as f:
-                    f.write(json.dumps(data) + "\n")
-                    f.flush()
-            else:
-                # Fallback to stdout if file writing fails
-                print(json.dumps(data), flush=True)
-        except Exception:
-            # If file writing fails, fall back to stdout
-            print(json.dumps(data), flush=True)
+            self._queue.put_nowait(data)
+        except queue.Full:
+            # Drop rather than stall the test run behind a slow disk
+            self.dropped_records += 1
+
+    def _start_writer(self):
+        """Start the background writer thread."""
+        self._queue = queue.Queue(maxsize=self.writer_queue_size)
+        self._writer_thread = threading.Thread(
+            target=self._run_writer, name="trim-telemetry-writer", daemon=True
+        )
+        self._writer_thread.start()
+
+    def _run_writer(self):
+        """Drain queued records, writing each batch with a single call."""
+        records_queue = self._queue
+        while True:
+            batch = [records_queue.get()]
+            # Take whatever else is already waiting, up to the batch limit
+            while len(batch) < self.writer_batch_size:
+                try:
+                    batch.append(records_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = batch[-1] is _STOP_WRITER
+            if stop:
+                batch.pop()
+            try:
+                if batch:
+                    self._write_payload(
+                        b"".join(_dumps_line(data) for data in batch), True
+                    )
+            except Exception:
+                # Silently handle errors - telemetry should not break tests
+                pass
+            finally:
+                for _ in range(len(batch) + stop):
+                    records_queue.task_done()
+            if stop:
+                return
+
+    def _stop_writer(self, timeout: float = 5.0):
+        """Let the background writer drain its queue and exit."""
+        thread = self._writer_thread
+        if thread is None:
+            return
+        self._writer_thread = None
+        try:
+            self._queue.put(_STOP_WRITER, timeout=timeout)
+        except queue.Full:
+            pass
+        else:
+            thread.join(timeout)
+
+        if self.dropped_records:
+            sys.stderr.write(
+                f"trim-telemetry: dropped {self.dropped_records} records "
+                "because the background writer queue was full\n"
+            )
+
+    def flush_telemetry(self):
+        """Push any buffered telemetry records out to the file."""
+        if self._writer_thread is not None:
+            # Wait until the background writer has written everything queued
+            self._queue.join()
+
+        with self._write_lock:
+            try:
+                if self._fh is not None:
+                    self._fh.flush()
+                else:
+                    # Records fell back to stdout; push out any left buffered
+                    sys.stdout.flush()
+            except Exception:
+                # Silently handle errors - telemetry should not break tests
+                pass
+
+    def close_telemetry(self):
+        """Flush and close the telemetry file."""
+        self._stop_writer()
+
+        with self._write_lock:
+            fh, self._fh = self._fh, None
+            if fh is None:
+                return
+            try:
+                fh.close()
+            except Exception:
+                # Silently handle errors - telemetry should not break tests
+                pass
+
+    def _write_stdout(self, payload: bytes, flush: bool = True):
+        """Write serialized telemetry lines to stdout with a single write call."""
+        sys.stdout.write(payload.decode("utf-8"))
+        if flush:
+            sys.stdout.flush()
 
     def start_test(self, test, test_id: str = None):
         """Start tracking a test."""
         if test_id is None:
             test_id = str(test)
 
-        self.test_status[test_id] = "running"
-        self.test_timings[test_id] = time.time()
+        # Wall clock for the reported timestamps, monotonic counter for the span
+        self.test_timings[test_id] = (time.time(), time.perf_counter_ns())
 
         # Initialize tracking for this test
         self.test_queries[test_id] = 0
-        self.test_network_calls[test_id] = []
+        if self.record_network_calls:
+            self.test_network_calls[test_id] = {
+                "calls": deque(maxlen=self.max_network_calls)
+            }
 
     def end_test(self, test, status: str, test_id: str = None):
         """End tracking a test and return telemetry data."""
         if test_id is None:
             test_id = str(test)
 
-        end_time = time.time()
-        start_time = self.test_timings.get(test_id, end_time)
-        duration_ms = round((end_time - start_time) * 1000)
+        start_time, end_time = self.get_test_times(test_id)
 
         # Collect telemetry data
         database_telemetry = self._collect_database_telemetry(test_id)
         network_telemetry = self._collect_network_telemetry(test_id)
+        test_class = type(test)
+        class_meta = self._class_meta_cache.get(test_class)
+        if class_meta is None:
+            test_module = test_class.__module__
+            class_meta = (
+                test_class.__name__,
+                test_module,
+                test_module.replace(".", "/") + ".py",
+            )
+            self._class_meta_cache[test_class] = class_meta
+        class_name, test_module, test_file = class_meta
 
         # Create test telemetry with flattened database fields
         test_telemetry = {
-            "schema_version": "1.0.0",
+            "schema_version": SCHEMA_VERSION,
             "run_id": self.run_id,
             "id": test_id,
             "name": getattr(test, "_testMethodName", test_id),
-            "class": test.__class__.__name__,
-            "module": test.__class__.__module__,
-            "file": test.__class__.__module__.replace(".", "/") + ".py",
+            "class": class_name,
+            "module": test_module,
+            "file": test_file,
             "status": status,
             "start_time": datetime.fromtimestamp(start_time).isoformat(),
             "end_time": datetime.fromtimestamp(end_time).isoformat(),
@@ -101,26 +312,29 @@ class BaseTelemetryCollector:
 
         return test_telemetry
 
+    def get_test_times(self, test_id: str):
+        """Return the wall-clock start and end timestamps for a test.
+
+        The end timestamp is the start plus the elapsed monotonic time, so a
+        system clock adjustment mid-test cannot skew or invert the span.
+        """
+        started = self.test_timings.get(test_id)
+        if started is None:
+            end_time = time.time()
+            return end_time, end_time
+
+        start_time, start_ns = started
+        return start_time, start_time + (time.perf_counter_ns() - start_ns) / 1e9
+
     def _cleanup_test_data(self, test_id: str):
         """Clean up test tracking data."""
-        try:
-            if test_id in self.test_queries:
-                del self.test_queries[test_id]
-            if test_id in self.test_network_calls:
-                del self.test_network_calls[test_id]
-            if test_id in self.test_timings:
-                del self.test_timings[test_id]
-            if test_id in self.test_status:
-                del self.test_status[test_id]
-        except Exception:
-            # Silently handle errors - telemetry should not break tests
-            pass
+        self.test_queries.pop(test_id, None)
+        self.test_network_calls.pop(test_id, None)
+        self.test_timings.pop(test_id, None)
 
     def _get_empty_database_telemetry(self):
         """Return empty database telemetry structure."""
-        return {
-            "queries": [],
-        }
+        return _EMPTY_DATABASE_TELEMETRY
 
     def _collect_database_telemetry(self, test_id: str):
         """Collect database telemetry for a test. Override in subclasses."""
@@ -130,23 +344,18 @@ class BaseTelemetryCollector:
 
     def _collect_network_telemetry(self, test_id: str):
         """Collect network telemetry for a test. Override in subclasses."""
-        try:
-            network_data = self.test_network_calls.get(test_id, {})
-            calls = network_data.get("calls", [])
+        network_data = self.test_network_calls.get(test_id)
+        calls = network_data.get("calls") if network_data else None
+        if not calls:
+            return _EMPTY_NETWORK_TELEMETRY
 
-            if not calls:
-                return {
-                    "urls": [],
-                }
+        # Buffers hold the URL strings themselves
+        with self._network_lock:
+            urls = list(calls)
 
-            return {
-                "urls": [call.get("url", "unknown") for call in calls],
-            }
-
-        except Exception:
-            return {
-                "urls": [],
-            }
+        return {
+            "urls": urls,
+        }
 
     def start_network_monitoring(self, test_id: str):
         """Start monitoring network calls for a test. Override in subclasses."""
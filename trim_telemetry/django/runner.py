@@ -25,29 +25,51 @@ class TelemetryTestResult(unittest.TextTestResult):
 
         super().__init__(*args, **kwargs)
         self.telemetry_collector = telemetry_collector
+        # str(test) of the running test, computed once in startTest
+        self._current_test = None
+        self._current_test_id = None
+
+    def _get_test_id(self, test):
+        """Return the test id computed in startTest, or build it if needed."""
+        if test is self._current_test:
+            return self._current_test_id
+        return str(test)
 
     def startTest(self, test):
         super().startTest(test)
-        self.telemetry_collector.start_test(test)
+        self._current_test = test
+        self._current_test_id = str(test)
+        self.telemetry_collector.start_test(test, self._current_test_id)
 
     def addSuccess(self, test):
         super().addSuccess(test)
-        test_telemetry = self.telemetry_collector.end_test(test, "passed")
+        test_telemetry = self.telemetry_collector.end_test(
+            test, "passed", self._get_test_id(test)
+        )
         self.telemetry_collector.output_test_telemetry(test_telemetry)
 
     def addError(self, test, err):
         super().addError(test, err)
-        test_telemetry = self.telemetry_collector.end_test(test, "error")
+        test_telemetry = self.telemetry_collector.end_test(
+            test, "error", self._get_test_id(test)
+        )
         self.telemetry_collector.output_test_telemetry(test_telemetry)
 
     def addFailure(self, test, err):
         super().addFailure(test, err)
-        test_telemetry = self.telemetry_collector.end_test(test, "failed")
+        test_telemetry = self.telemetry_collector.end_test(
+            test, "failed", self._get_test_id(test)
+        )
         self.telemetry_collector.output_test_telemetry(test_telemetry)
 
     def addSkip(self, test, reason):
         super().addSkip(test, reason)
-        test_telemetry = self.telemetry_collector.end_test(test, "skipped")
+        if not self.telemetry_collector.record_skipped:
+            self.telemetry_collector._cleanup_test_data(self._get_test_id(test))
+            return
+        test_telemetry = self.telemetry_collector.end_test(
+            test, "skipped", self._get_test_id(test)
+        )
         self.telemetry_collector.output_test_telemetry(test_telemetry)
 
 
@@ -70,7 +92,10 @@ class TelemetryTestRunner(DiscoverRunner):
         )
 
         # Run the suite
-        suite.run(result)
+        try:
+            suite.run(result)
+        finally:
+            self.telemetry_collector.flush_telemetry()
 
         return result
 
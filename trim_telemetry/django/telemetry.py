@@ -2,154 +2,203 @@
 Django-specific telemetry collection
 """
 
+import time
 import urllib.request
-from django.db import connection, reset_queries
+from collections import defaultdict, deque
+from contextlib import ExitStack
+from django.db import connections
 from ..base_telemetry import BaseTelemetryCollector
 
 
+def _new_query_signature():
+    """Return an empty [count, total_duration, sql] accumulator."""
+    return [0, 0.0, None]
+
+
 class DjangoTelemetryCollector(BaseTelemetryCollector):
     """Django-specific telemetry collector with database and network monitoring."""
 
     def __init__(self, run_id: str):
         super().__init__(run_id)
-        self._ensure_query_logging_enabled()
-
-    def _ensure_query_logging_enabled(self):
-        """Ensure Django query logging is enabled."""
-        try:
-            # Reset any existing queries
-            reset_queries()
-
-            # Note: Django's test runner already enables query logging for tests
-            # We don't need to modify settings.DEBUG as it can interfere with
-            # database setup/teardown behavior
-        except Exception:
-            # Silently handle errors - telemetry should not break tests
-            pass
+        # Test that intercepted queries and network calls are attributed to.
+        # This and the two fields below track a single running test, so the
+        # collector must not be shared by tests running in parallel threads
+        self._current_test_id = None
+        # That test's network call buffer, read directly by the urlopen wrapper
+        self._current_network_calls = None
+        # Execute wrappers installed on each connection for the running test
+        self._query_wrappers = None
+        # The unwrapped urlopen and its wrapper, set once the network patch
+        # is installed
+        self._original_urlopen = None
+        self._tracked_urlopen = None
 
     def start_test(self, test, test_id: str = None):
         """Start tracking a Django test with database and network monitoring."""
-        super().start_test(test, test_id)
-
         if test_id is None:
             test_id = str(test)
 
-        # Store initial query count for this test BEFORE resetting
-        initial_count = len(connection.queries)
-        self.test_queries[test_id] = initial_count
+        super().start_test(test, test_id)
+        self._current_test_id = test_id
 
-        # Reset queries after storing initial count (Django best practice)
-        reset_queries()
+        # Queries are aggregated by signature as they execute
+        self.test_queries[test_id] = defaultdict(_new_query_signature)
+        self._install_query_wrappers()
 
-        # Start network call monitoring for this test
-        self.start_network_monitoring(test_id)
+        # Start network call monitoring for this test unless disabled
+        if self.record_network_calls:
+            self.start_network_monitoring(test_id)
 
-    def _collect_database_telemetry(self, test_id: str):
-        """Collect database telemetry for a Django test."""
+    def _install_query_wrappers(self):
+        """Wrap query execution on every connection for the running test.
+
+        execute_wrapper sees every query regardless of DEBUG, so the collector
+        does not depend on Django keeping its in-memory query log.
+        """
+        self._remove_query_wrappers()
+        wrappers = ExitStack()
         try:
-            # Get the initial query count for this test
-            initial_count = self.test_queries.get(test_id, 0)
-
-            # Check if connection.queries is available
-            if not hasattr(connection, "queries"):
-                return self._get_empty_database_telemetry()
-
-            current_queries = connection.queries
-
-            # Get queries that were executed during this test
-            test_queries = current_queries[initial_count:]
-            query_count = len(test_queries)
-
-            if query_count == 0:
-                return self._get_empty_database_telemetry()
-
-            # Analyze queries
-            total_duration = 0
-            query_signatures = {}
-
-            # First pass: collect all queries and track signatures
-            for query in test_queries:
-                # Handle both string and numeric duration values
-                duration_raw = query.get("time", 0)
-                try:
-                    duration = float(duration_raw) if duration_raw else 0
-                except (ValueError, TypeError):
-                    duration = 0
-
-                total_duration += duration
-
-                # Track duplicate queries (same SQL)
-                sql = query.get("sql", "").upper().strip()
-                sql_signature = sql[:100]  # First 100 chars for signature
-                if sql_signature in query_signatures:
-                    query_signatures[sql_signature]["count"] += 1
-                    query_signatures[sql_signature]["total_duration"] += duration
-                else:
-                    query_signatures[sql_signature] = {
-                        "sql": query.get("sql", "")[:200] + "..."
-                        if len(query.get("sql", "")) > 200
-                        else query.get("sql", ""),
-                        "count": 1,
-                        "total_duration": duration,
-                    }
-
-            # Second pass: create query objects with counts
-            all_queries = []
-            for signature, data in query_signatures.items():
-                all_queries.append({
-                    "sql": data["sql"],
-                    "total_duration_ms": round(data["total_duration"] * 1000),
-                    "count": data["count"],
-                })
-
-            return {
-                "queries": all_queries,
-            }
+            for conn in connections.all():
+                wrappers.enter_context(conn.execute_wrapper(self._record_query))
+        except Exception:
+            # Silently handle errors - telemetry should not break tests
+            pass
+        self._query_wrappers = wrappers
 
+    def _remove_query_wrappers(self):
+        """Remove the execute wrappers installed for the previous test."""
+        wrappers, self._query_wrappers = self._query_wrappers, None
+        if wrappers is None:
+            return
+        try:
+            wrappers.close()
         except Exception:
-            # If there's any error collecting database telemetry, return zeros
+            # Silently handle errors - telemetry should not break tests
+            pass
+
+    def _record_query(self, execute, sql, params, many, context):
+        """Execute a query and add it to the running test's signatures."""
+        query_signatures = self.test_queries.get(self._current_test_id)
+        if query_signatures is None:
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            try:
+                # Track duplicate queries (same SQL). Parameters are still
+                # placeholders here, so the statement itself is the signature;
+                # hashing it allocates nothing, and statements that only share
+                # a long prefix such as a column list are not merged. Composed
+                # statements (e.g. psycopg2.sql) are unhashable, so key on str.
+                if not isinstance(sql, str):
+                    sql = str(sql) if sql is not None else ""
+                entry = query_signatures[sql]
+                entry[0] += 1
+                entry[1] += duration
+                if entry[2] is None:
+                    entry[2] = sql[:200] + "..." if len(sql) > 200 else sql
+            except Exception:
+                # Silently handle errors - telemetry should not break tests
+                pass
+
+    def _cleanup_test_data(self, test_id: str):
+        """Clean up test tracking data and stop recording queries."""
+        if self._current_test_id == test_id:
+            self._remove_query_wrappers()
+            self._current_test_id = None
+            self._current_network_calls = None
+        super()._cleanup_test_data(test_id)
+
+    def _collect_database_telemetry(self, test_id: str):
+        """Collect database telemetry for a Django test."""
+        query_signatures = self.test_queries.get(test_id)
+        if not query_signatures:
             return self._get_empty_database_telemetry()
 
+        return {
+            "queries": [
+                {
+                    "sql": sql,
+                    "total_duration_ms": round(total_duration * 1000),
+                    "count": count,
+                }
+                for count, total_duration, sql in list(query_signatures.values())
+            ],
+        }
+
     def start_network_monitoring(self, test_id: str):
         """Start monitoring network calls for a Django test."""
         try:
-            # Store original urllib methods and initialize call tracking
-            self.test_network_calls[test_id] = {
-                "calls": [],
-                "original_urlopen": urllib.request.urlopen,
-                "original_request": getattr(urllib.request, "Request", None),
-            }
-
-            # Create a simple tracked version that just logs URLs
-            def tracked_urlopen(*args, **kwargs):
-                # Only track if this is called during our test's execution
-                if test_id not in self.test_network_calls:
-                    # Fall back to original if test is no longer active
-                    return self.test_network_calls.get(test_id, {}).get(
-                        "original_urlopen", urllib.request.urlopen
-                    )(*args, **kwargs)
-
-                # Just capture the URL - no timing, no blocking
-                url = args[0] if args else kwargs.get("url", "unknown")
-                url_str = str(url)
-
-                # Make the actual call using the original function (no timing)
-                result = self.test_network_calls[test_id]["original_urlopen"](
-                    *args, **kwargs
-                )
-
-                # Log the call (just URL, no duration or status)
-                self.test_network_calls[test_id]["calls"].append(
-                    {
-                        "url": url_str,
-                    }
-                )
-
-                return result
-
-            # Apply the patch
-            urllib.request.urlopen = tracked_urlopen
+            # start_test has usually created the buffer already
+            network_data = self.test_network_calls.setdefault(
+                test_id, {"calls": deque(maxlen=self.max_network_calls)}
+            )
+            self._current_test_id = test_id
+            self._current_network_calls = network_data["calls"]
+            self._install_network_patch()
+        except Exception:
+            # Silently handle errors - telemetry should not break tests
+            pass
 
+    def _install_network_patch(self):
+        """Wrap urllib.request.urlopen once for the lifetime of the collector.
+
+        The wrapper attributes each call to the test most recently started,
+        which also covers threads that test spawns. Patching once avoids
+        chaining a new wrapper on top of the previous one for every test.
+        """
+        if self._original_urlopen is not None:
+            return
+
+        original_urlopen = urllib.request.urlopen
+        network_lock = self._network_lock
+        collector = self
+
+        # The original function and lock are bound as closure locals so the
+        # intercept path reads a single attribute from the collector.
+        def tracked_urlopen(*args, **kwargs):
+            # Only track if a test is running and has not been cleaned up
+            calls = collector._current_network_calls
+            if calls is None:
+                return original_urlopen(*args, **kwargs)
+
+            # Just capture the URL - no timing, no blocking
+            url = args[0] if args else kwargs.get("url", "unknown")
+            url_str = str(url)
+
+            # Make the actual call using the original function (no timing)
+            result = original_urlopen(*args, **kwargs)
+
+            # Log the call (just the URL string, no duration or status)
+            with network_lock:
+                calls.append(url_str)
+
+            return result
+
+        self._original_urlopen = original_urlopen
+        self._tracked_urlopen = tracked_urlopen
+        urllib.request.urlopen = tracked_urlopen
+
+    def _uninstall_network_patch(self):
+        """Restore the original urllib.request.urlopen."""
+        if self._original_urlopen is None:
+            return
+
+        # Leave urlopen alone if something else has wrapped it since; that
+        # wrapper still holds a reference to ours
+        if urllib.request.urlopen is self._tracked_urlopen:
+            urllib.request.urlopen = self._original_urlopen
+        self._original_urlopen = None
+        self._tracked_urlopen = None
+
+    def close_telemetry(self):
+        """Flush and close the telemetry file and remove the network patch."""
+        super().close_telemetry()
+        try:
+            self._uninstall_network_patch()
         except Exception:
             # Silently handle errors - telemetry should not break tests
             pass
@@ -157,14 +206,9 @@ class DjangoTelemetryCollector(BaseTelemetryCollector):
     def stop_network_monitoring(self, test_id: str):
         """Stop monitoring network calls for a Django test."""
         try:
-            if test_id in self.test_network_calls:
-                # Restore original urllib methods
-                network_data = self.test_network_calls[test_id]
-                if "original_urlopen" in network_data:
-                    urllib.request.urlopen = network_data["original_urlopen"]
-
-                # Clean up
-                del self.test_network_calls[test_id]
+            self.test_network_calls.pop(test_id, None)
+            if self._current_test_id == test_id:
+                self._current_network_calls = None
         except Exception:
             # Silently handle errors - telemetry should not break tests
             pass
@@ -4,23 +4,18 @@ Pytest test runner with telemetry collection
 
 import sys
 from datetime import datetime
-from ..base_telemetry import BaseTelemetryCollector
+from ..base_telemetry import BaseTelemetryCollector, SCHEMA_VERSION
 
 
 class PytestTelemetryCollector(BaseTelemetryCollector):
     """Pytest-specific telemetry collector."""
 
-    def __init__(self, run_id: str):
-        super().__init__(run_id)
-        self.test_start_times = {}
-
     def start_test(self, test, test_id: str = None):
         """Start tracking a pytest test."""
         if test_id is None:
             test_id = test.nodeid if hasattr(test, "nodeid") else str(test)
 
         super().start_test(test, test_id)
-        self.test_start_times[test_id] = datetime.now().timestamp()
 
     def end_test(self, test, status: str, test_id: str = None):
         """End tracking a pytest test and return telemetry data."""
@@ -43,12 +38,9 @@ class PytestTelemetryPlugin:
     def pytest_runtest_logreport(self, report):
         """Called for each test report."""
         if report.when == "call":  # Only process the actual test call
+            collector = self.telemetry_collector
             test_id = report.nodeid
-            start_time = self.telemetry_collector.test_start_times.get(
-                test_id, datetime.now().timestamp()
-            )
-            end_time = datetime.now().timestamp()
-            duration_ms = round((end_time - start_time) * 1000)
+            start_time, end_time = collector.get_test_times(test_id)
 
             # Determine test status
             if report.outcome == "passed":
@@ -60,20 +52,20 @@ class PytestTelemetryPlugin:
             else:
                 status = "unknown"
 
-            # Get test metadata
-            test_name = (
-                report.nodeid.split("::")[-1]
-                if "::" in report.nodeid
-                else report.nodeid
-            )
-            test_file = report.nodeid.split("::")[0] if "::" in report.nodeid else ""
-            test_class = ""
-            if "::" in report.nodeid and len(report.nodeid.split("::")) > 2:
-                test_class = report.nodeid.split("::")[1]
-
-            # Create test telemetry
+            if status == "skipped" and not collector.record_skipped:
+                collector._cleanup_test_data(test_id)
+                return
+
+            # Get test metadata from the node id: file::[class::]name
+            nodeid_parts = test_id.split("::")
+            test_name = nodeid_parts[-1]
+            test_file = nodeid_parts[0] if len(nodeid_parts) > 1 else ""
+            test_class = nodeid_parts[1] if len(nodeid_parts) > 2 else ""
+
+            # Create test telemetry with the same flattened fields as the base collector
             test_telemetry = {
-                "run_id": self.telemetry_collector.run_id,
+                "schema_version": SCHEMA_VERSION,
+                "run_id": collector.run_id,
                 "id": test_id,
                 "name": test_name,
                 "class": test_class,
@@ -82,19 +74,25 @@ class PytestTelemetryPlugin:
                 "status": status,
                 "start_time": datetime.fromtimestamp(start_time).isoformat(),
                 "end_time": datetime.fromtimestamp(end_time).isoformat(),
-                "database": self.telemetry_collector._get_empty_database_telemetry(),
-                "network": self.telemetry_collector._collect_network_telemetry(test_id),
-                "test_performance": {
-                    "duration_ms": duration_ms,
-                },
+                "db_queries": collector._collect_database_telemetry(test_id).get(
+                    "queries", []
+                ),
+                "net_urls": collector._collect_network_telemetry(test_id).get(
+                    "urls", []
+                ),
             }
 
-            self.telemetry_collector.output_test_telemetry(test_telemetry)
+            collector._cleanup_test_data(test_id)
+            collector.output_test_telemetry(test_telemetry)
+        elif report.when == "teardown":
+            # Tests that failed or were skipped during setup never report a
+            # call phase; release their tracking state here
+            self.telemetry_collector._cleanup_test_data(report.nodeid)
 
     def pytest_sessionfinish(self, session, exitstatus):
         """Called after test session finishes."""
         # Summary data is now calculated by analysis tools from individual test records
-        pass
+        self.telemetry_collector.flush_telemetry()
 
 
 def main():
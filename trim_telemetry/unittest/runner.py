@@ -5,24 +5,12 @@ Unittest test runner with telemetry collection
 import sys
 import unittest
 from datetime import datetime
-from ..base_telemetry import BaseTelemetryCollector
+from ..base_telemetry import BaseTelemetryCollector, SCHEMA_VERSION
 
 
 class UnittestTelemetryCollector(BaseTelemetryCollector):
     """Unittest-specific telemetry collector."""
 
-    def __init__(self, run_id: str):
-        super().__init__(run_id)
-        self.test_start_times = {}
-
-    def start_test(self, test, test_id: str = None):
-        """Start tracking a unittest test."""
-        if test_id is None:
-            test_id = str(test)
-
-        super().start_test(test, test_id)
-        self.test_start_times[test_id] = datetime.now().timestamp()
-
 
 class TelemetryTestResult(unittest.TextTestResult):
     """Custom test result class for unittest telemetry collection."""
@@ -40,63 +28,98 @@ class TelemetryTestResult(unittest.TextTestResult):
 
         super().__init__(*args, **kwargs)
         self.telemetry_collector = telemetry_collector
+        # (class name, module, file) per test class, resolved on first use
+        self._class_meta_cache = {}
+        # str(test) of the running test, computed once in startTest
+        self._current_test = None
+        self._current_test_id = None
+        # Lengths of failures, errors and skipped when the running test started
+        self._outcome_counts = (0, 0, 0)
 
     def startTest(self, test):
         super().startTest(test)
-        self.telemetry_collector.start_test(test)
+        self._current_test = test
+        self._current_test_id = str(test)
+        self._outcome_counts = (
+            len(self.failures),
+            len(self.errors),
+            len(self.skipped),
+        )
+        self.telemetry_collector.start_test(test, self._current_test_id)
 
     def stopTest(self, test):
-        end_time = datetime.now().timestamp()
-        test_id = str(test)
-        start_time = self.telemetry_collector.test_start_times.get(test_id, end_time)
-        duration_ms = round((end_time - start_time) * 1000)
+        collector = self.telemetry_collector
+        if test is self._current_test:
+            test_id = self._current_test_id
+        else:
+            test_id = str(test)
+        start_time, end_time = collector.get_test_times(test_id)
 
-        # Determine test status
-        if test in [f[0] for f in self.failures] or test in [e[0] for e in self.errors]:
+        # Determine test status from what was added since startTest
+        failures, errors, skipped = self._outcome_counts
+        if len(self.failures) > failures or len(self.errors) > errors:
             status = "failed"
-        elif test in [s[0] for s in self.skipped]:
+        elif len(self.skipped) > skipped:
             status = "skipped"
         else:
             status = "passed"
 
+        if status == "skipped" and not collector.record_skipped:
+            collector._cleanup_test_data(test_id)
+            super().stopTest(test)
+            return
+
         # Get test metadata
         test_name = getattr(test, "_testMethodName", "")
-        test_class = test.__class__.__name__
-        test_module = test.__class__.__module__
-
-        # Try to get test file path
-        test_file = ""
-        if hasattr(test, "__class__") and hasattr(test.__class__, "__module__"):
-            try:
-                import importlib
-
-                module = importlib.import_module(test.__class__.__module__)
-                if hasattr(module, "__file__"):
-                    test_file = module.__file__
-            except Exception:
-                test_file = f"{test_module}.py"
+        test_class, test_module, test_file = self._get_class_metadata(type(test))
 
-        # Create test telemetry
+        # Create test telemetry with the same flattened fields as the base collector
         test_telemetry = {
-            "run_id": self.telemetry_collector.run_id,
+            "schema_version": SCHEMA_VERSION,
+            "run_id": collector.run_id,
             "id": test_id,
             "name": test_name,
             "class": test_class,
             "module": test_module,
-                "file": test_file,
-                "status": status,
+            "file": test_file,
+            "status": status,
             "start_time": datetime.fromtimestamp(start_time).isoformat(),
             "end_time": datetime.fromtimestamp(end_time).isoformat(),
-            "database": self.telemetry_collector._get_empty_database_telemetry(),
-            "network": self.telemetry_collector._collect_network_telemetry(test_id),
-            "test_performance": {
-                "duration_ms": duration_ms,
-            },
+            "db_queries": collector._collect_database_telemetry(test_id).get(
+                "queries", []
+            ),
+            "net_urls": collector._collect_network_telemetry(test_id).get(
+                "urls", []
+            ),
         }
 
-        self.telemetry_collector.output_test_telemetry(test_telemetry)
+        collector._cleanup_test_data(test_id)
+        collector.output_test_telemetry(test_telemetry)
         super().stopTest(test)
 
+    def _get_class_metadata(self, test_type):
+        """Return the class name, module and file path for a test class."""
+        class_meta = self._class_meta_cache.get(test_type)
+        if class_meta is not None:
+            return class_meta
+
+        test_module = test_type.__module__
+
+        # Try to get test file path
+        test_file = ""
+        try:
+            import importlib
+
+            module = importlib.import_module(test_module)
+            if hasattr(module, "__file__"):
+                test_file = module.__file__
+        except Exception:
+            test_file = f"{test_module}.py"
+
+        class_meta = (test_type.__name__, test_module, test_file)
+        self._class_meta_cache[test_type] = class_meta
+        return class_meta
+
 
 class TelemetryTestRunner(unittest.TextTestRunner):
     """Unittest test runner with telemetry collection."""
@@ -124,6 +147,7 @@ class TelemetryTestRunner(unittest.TextTestRunner):
             stopTestRun = getattr(result, "stopTestRun", None)
             if stopTestRun is not None:
                 stopTestRun()
+            self.telemetry_collector.flush_telemetry()
 
         # Summary data is now calculated by analysis tools from individual test records
         return result